@@ -4,141 +4,587 @@ visualize_azure_graph.py
 
 Read Test_data/Azure/Azure_Arm.csv, build a graph where nodes are values
 from the `name` column and edges are inferred when one resource's fields
-reference another resource's `id`. Saves `azure_graph.png` and shows the plot.
+reference another resource's `id`. Saves an interactive `azure_graph.html`;
+with --png it also renders `azure_graph.png` with matplotlib and shows the plot.
 
 Usage:
-    python visualize_azure_graph.py [path/to/Azure_Arm.csv]
+    python visualize_azure_graph.py [--png] [--chunksize ROWS] [--jobs N] [path/to/Azure_Arm.csv]
+
+--chunksize streams the CSV in chunks of ROWS rows instead of loading it whole;
+--jobs scans for references in N worker processes (0 = one per CPU).
 
 If required packages are missing the script will print installation instructions.
 """
 from __future__ import annotations
+import argparse
+import collections
 import sys
 import json
+import functools
+import itertools
 import os
+import re
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from urllib.parse import quote
 try:
+    import numpy as np
     import pandas as pd
     import networkx as nx
-    import matplotlib.pyplot as plt
-    # pyvis is optional; used for interactive HTML export
+    # pyahocorasick is optional; used for fast multi-id reference matching
+    try:
+        import ahocorasick
+        _HAS_AHOCORASICK = True
+    except Exception:
+        _HAS_AHOCORASICK = False
+    # hyperscan is optional; used instead of a regex for very large id sets
+    try:
+        import hyperscan
+        _HAS_HYPERSCAN = True
+    except Exception:
+        _HAS_HYPERSCAN = False
+    # polars is optional; its multithreaded CSV reader is used when pandas
+    # cannot use the pyarrow engine
+    try:
+        import polars as pl
+        _HAS_POLARS = True
+    except Exception:
+        _HAS_POLARS = False
+    # orjson is optional; parses the large `properties` blobs much faster
     try:
-        from pyvis.network import Network
-        _HAS_PYVIS = True
+        import orjson as _json
     except Exception:
-        _HAS_PYVIS = False
+        _json = json
 except Exception as e:
     print("Missing required packages. Install with:")
     print("\n    pip install -r requirements.txt\n")
     raise
 
 
-def build_graph_from_csv(csv_path: Path) -> nx.DiGraph:
-    df = pd.read_csv(csv_path, dtype=str).fillna("")
+# resource types whose JSON `properties` are checked for internet exposure
+_PROPERTIES_TYPES = frozenset({
+    'microsoft.network/networksecuritygroups',
+    'microsoft.storage/storageaccounts',
+})
 
-    # ensure the columns exist
-    if 'id' not in df.columns or 'name' not in df.columns:
-        raise SystemExit("CSV must contain 'id' and 'name' columns")
+# low-cardinality columns that are stored as categoricals after loading
+CATEGORY_COLUMNS = ('type', 'resourceGroup', 'location')
 
-    # map id -> name
-    id_to_name = {row['id']: row['name'] for _, row in df.iterrows() if row['id']}
-    id_to_row = {row['id']: row for _, row in df.iterrows() if row['id']}
 
-    # create graph
-    G = nx.DiGraph()
+def _read_csv(csv_path: Path) -> pd.DataFrame:
+    """Load the export as strings, using the multithreaded pyarrow reader when
+    it is available, polars when it is not, and the default C engine otherwise.
+    Files either fast reader rejects are read with the C engine, which is more
+    lenient about malformed rows.
+    """
+    df = None
+    try:
+        df = pd.read_csv(csv_path, dtype=str, engine='pyarrow', dtype_backend='pyarrow')
+    except (ImportError, TypeError):
+        if _HAS_POLARS:
+            try:
+                df = _read_csv_polars(csv_path)
+            except pl.exceptions.PolarsError:
+                pass
+    except ValueError:
+        pass
+    if df is None:
+        return _prepare_frame(pd.read_csv(csv_path, dtype=str))
+    # neither fast reader renames repeated headers the way the C engine does
+    # (id, id.1), so take the column names from it
+    df.columns = pd.read_csv(csv_path, nrows=0).columns
+    return _prepare_frame(df)
 
-    # add all names as nodes
-    for _, row in df.iterrows():
-        name = row['name']
-        if not name:
-            continue
-        # attach attributes if available
-        # attach all CSV columns (non-empty) as node attributes so the interactive
-        # properties panel can show original CSV fields
-        attrs = {}
-        for key in df.columns:
-            val = row.get(key)
-            if val is not None and val != "":
-                # store as string
-                attrs[key] = str(val)
-        G.add_node(name, **attrs)
+
+# strings pandas reads as missing by default; polars is given the same list so
+# both readers agree on which cells are empty
+_NA_VALUES = ('', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND',
+              '1.#QNAN', '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null')
+
+
+def _read_csv_polars(csv_path: Path) -> pd.DataFrame:
+    """Read the export with polars' multithreaded reader into a pandas DataFrame
+    of strings. Built column by column, so pyarrow is not needed.
+    """
+    df = pl.read_csv(csv_path, infer_schema_length=0, null_values=list(_NA_VALUES)).fill_null("")
+    return pd.DataFrame({c: df[c].to_numpy() for c in df.columns}, dtype=object)
+
+
+def _read_csv_chunks(csv_path: Path, chunksize: int, usecols=None):
+    """Yield the export as DataFrames of at most ``chunksize`` rows. The pyarrow
+    engine cannot read incrementally, so this always uses the C engine.
+    """
+    with pd.read_csv(csv_path, dtype=str, usecols=usecols, chunksize=chunksize) as reader:
+        for df in reader:
+            yield _prepare_frame(df)
+
+
+def _prepare_frame(df: pd.DataFrame) -> pd.DataFrame:
+    df = df.fillna("")
+    for c in CATEGORY_COLUMNS:
+        if c in df.columns:
+            df[c] = df[c].astype('category')
+    return df
+
+
+def build_edges_and_attrs(csv_path: Path, chunksize: int | None = None,
+                          jobs: int = 1) -> tuple[list, dict, list]:
+    """Read the CSV and return the graph as parallel arrays rather than a DiGraph.
+
+    Returns ``(names, columns, edges)``: ``names`` lists every node once,
+    ``columns`` maps each attribute to a list of values aligned with ``names``
+    ("" where the node has no value) and ``edges`` is a list of
+    ``(src_name, tgt_name)`` pairs.
+
+    With ``chunksize`` the file is streamed twice in chunks of that many rows
+    (once for ids, once for everything else) instead of being loaded whole, so
+    the full DataFrame is never held in memory.
+
+    With ``jobs`` > 1 the reference scan is split across that many worker
+    processes (0 means one per CPU).
+    """
+    if chunksize:
+        id_chunks = _read_csv_chunks(csv_path, chunksize, usecols=lambda c: c in ('id', 'name'))
+        row_chunks = lambda: _read_csv_chunks(csv_path, chunksize)
+    else:
+        df = _read_csv(csv_path)
+        id_chunks = [df]
+        row_chunks = lambda: [df]
+
+    # pass 1: map id -> name over the whole file
+    id_to_name = {}
+    for chunk in id_chunks:
+        # ensure the columns exist
+        if 'id' not in chunk.columns or 'name' not in chunk.columns:
+            raise SystemExit("CSV must contain 'id' and 'name' columns")
+        ids = chunk['id'].to_numpy()
+        names = chunk['name'].to_numpy()
+        has_id = ids != ""
+        id_to_name.update(zip(ids[has_id], names[has_id]))
 
     # For each row, search its string fields for any known ids and add edges
     # from this resource -> referenced resource
     candidate_ids = list(id_to_name.keys())
 
-    # small optimization: only search in a subset of columns that typically contain references
-    search_columns = [c for c in df.columns if c in ('properties', 'tags', 'identity', 'managedBy', 'resourceGroup', 'type')]
-    # if properties column missing, fall back to all string columns
-    if not search_columns:
-        search_columns = [c for c in df.columns if df[c].dtype == object]
+    # each worker builds its own matcher once; the matcher closures cannot be
+    # pickled, and the parent only needs one when it scans rows itself
+    jobs = jobs or os.cpu_count() or 1
+    executor = None
+    if jobs > 1 and candidate_ids:
+        executor = ProcessPoolExecutor(jobs, initializer=_init_scan_worker, initargs=(candidate_ids,))
+    else:
+        find_ids = _build_id_matcher(candidate_ids)
+
+    # every Azure resource id contains this marker; when that holds for all known
+    # ids, rows without it cannot reference anything and are skipped cheaply
+    id_marker = '/subscriptions/'
+    if not all(id_marker in cid for cid in candidate_ids):
+        id_marker = ''
 
-    for _, row in df.iterrows():
-        src_name = row['name']
-        if not src_name:
-            continue
+    internet_sources = {'*', 'internet', '0.0.0.0/0'}
+    node_names = []
+    node_columns = {}
+    edges = []
+    exposed_names = []
+    # one shared str object per distinct value of the low-cardinality columns;
+    # each chunk's categoricals would otherwise carry their own copies
+    strings = {}
+
+    # pass 2: node attributes, exposure checks and references
+    try:
+        for df in row_chunks():
+            # pull every column out once as a plain array; iterating DataFrame rows
+            # materializes a Series per row and dominates load time on wide exports
+            columns = list(df.columns)
+            cols = {c: df[c].to_numpy() for c in columns}
+            n = len(df)
+            ids = cols['id']
+            names = cols['name']
+
+            # --- Parse exposure candidates' properties once ---
+            types = cols.get('type', [''] * n)
+            properties_col = cols.get('properties', ['{}'] * n)
+
+            for i in range(n):
+                node_type = types[i].lower()
+                # only these types need their properties; skip parsing everything else
+                if node_type not in _PROPERTIES_TYPES:
+                    continue
+                is_exposed = False
 
-        hay = " ".join(str(row.get(c, "")) for c in search_columns)
-        # naive substring match: many resource ids are long and unique
-        for cid in candidate_ids:
-            if cid == row['id']:
-                continue
-            if cid in hay:
-                tgt_name = id_to_name.get(cid)
-                if tgt_name:
-                    G.add_node(tgt_name)
-                    # preserve reference info on edges
-                    G.add_edge(src_name, tgt_name)
-
-    # --- Add Internet node for exposed NSGs ---
+                try:
+                    properties = _json.loads(properties_col[i])
+                    # Check for exposed NSGs
+                    if node_type == 'microsoft.network/networksecuritygroups':
+                        rules = properties.get('securityRules', [])
+                        for rule in rules:
+                            rule_props = rule.get('properties', {})
+                            if (rule_props.get('direction', '').lower() == 'inbound' and
+                                rule_props.get('access', '').lower() == 'allow' and
+                                rule_props.get('sourceAddressPrefix', '').lower() in internet_sources):
+                                is_exposed = True
+                                break # Found one open rule, no need to check others
+
+                    # Check for exposed Storage Accounts
+                    elif node_type == 'microsoft.storage/storageaccounts':
+                        network_acls = properties.get('networkAcls', {})
+                        if network_acls.get('defaultAction', '').lower() == 'allow':
+                            is_exposed = True
+
+                except (ValueError, AttributeError):
+                    continue
+
+                if is_exposed:
+                    exposed_names.append(names[i])
+
+            # add all names as nodes, carrying every CSV column so the interactive
+            # properties panel can show original CSV fields
+            has_name = names != ""
+            node_names.extend(names[has_name].tolist())
+            for c in columns:
+                values = cols[c][has_name].tolist()
+                if c in CATEGORY_COLUMNS:
+                    values = [strings.setdefault(v, v) for v in values]
+                node_columns.setdefault(c, []).extend(values)
+
+            # small optimization: only search in a subset of columns that typically contain references
+            search_columns = [c for c in df.columns if c in ('properties', 'tags', 'identity', 'managedBy', 'resourceGroup', 'type')]
+            # if properties column missing, fall back to all columns; every one is
+            # read as strings, whatever dtype the reader gave it
+            if not search_columns:
+                search_columns = columns
+
+            # build each row's search text once, as it is scanned: str.join is one C
+            # call per row, and not keeping the joined strings around avoids holding
+            # a second copy of every properties blob in the chunk
+            search_cols = [cols[c] for c in search_columns]
+            hays = (" ".join(row) for row in zip(*search_cols)) if search_cols else itertools.repeat("", n)
+
+            if executor is not None:
+                # stream the rows worth scanning to the worker processes
+                todo = ((i, hay) for i, hay in enumerate(hays) if names[i] and id_marker in hay)
+                row_refs = _scan_hays_parallel(executor, todo, jobs)
+            else:
+                row_refs = ((i, find_ids(hay)) for i, hay in enumerate(hays) if names[i] and id_marker in hay)
+
+            for i, refs in row_refs:
+                src_name = names[i]
+                for cid in refs:
+                    if cid == ids[i]:
+                        continue
+                    tgt_name = id_to_name.get(cid)
+                    if tgt_name:
+                        edges.append((src_name, tgt_name))
+    finally:
+        # also stop the workers when a later chunk fails to parse
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    if len(set(node_names)) != len(node_names):
+        node_names, node_columns = _merge_duplicate_nodes(node_names, node_columns)
+
+    existing_names = set(node_names)
+
+    # --- Add Internet node for exposed NSGs and Storage Accounts ---
     internet_node_name = "Internet"
-    internet_sources = {'*', 'internet', '0.0.0.0/0'}
-    has_internet_node = False
+    if exposed_names:
+        internet_attrs = {'type': 'Internet', 'group': 'Internet', 'size': 40}
+        if internet_node_name in existing_names:
+            # a resource is already called Internet; update it as add_node would
+            _update_node(node_names, node_columns, node_names.index(internet_node_name), internet_attrs)
+        else:
+            _append_node(node_names, node_columns, internet_node_name, internet_attrs)
+            existing_names.add(internet_node_name)
+        edges.extend((internet_node_name, node_name) for node_name in exposed_names)
+
+    # make sure every edge endpoint is a node. Reference targets are always named
+    # rows, so only exposed rows (which may have no name) need checking
+    for node_name in exposed_names:
+        if node_name not in existing_names:
+            _append_node(node_names, node_columns, node_name, {})
+            existing_names.add(node_name)
+
+    # taken from each node's final type and properties, so a merged node only
+    # gets a power state when the row that won is a VM
+    power_states = _power_states(node_columns.get('type', []), node_columns.get('properties', []))
+    if any(power_states):
+        node_columns['powerState'] = power_states
+
+    # the same reference can be found from several rows; keep each edge once
+    edges = list(dict.fromkeys(edges))
+
+    return node_names, node_columns, edges
+
+
+def build_graph_from_csv(csv_path: Path, chunksize: int | None = None, jobs: int = 1) -> nx.DiGraph:
+    return graph_from_arrays(*build_edges_and_attrs(csv_path, chunksize, jobs))
 
-    for _, row in df.iterrows():
-        node_type = row.get('type', '').lower()
-        node_name = row['name']
-        properties_str = row.get('properties', '{}')
-        is_exposed = False
 
+def graph_from_arrays(names: list, columns: dict, edges: list) -> nx.DiGraph:
+    """Bulk-load the arrays returned by build_edges_and_attrs into a DiGraph."""
+    keys = list(columns)
+
+    G = nx.DiGraph()
+    G.add_nodes_from(
+        (name, {k: v for k, v in zip(keys, row) if v != ""})
+        for name, row in zip(names, zip(*(columns[k] for k in keys)))
+    )
+    G.add_edges_from(edges)
+    return G
+
+
+def _merge_duplicate_nodes(names: list, columns: dict) -> tuple[list, dict]:
+    """Collapse rows that share a name into one node, keeping first-seen order.
+    Later non-empty values override earlier ones, as repeated add_node calls would.
+    """
+    index = {}
+    merged_names = []
+    merged = {k: [] for k in columns}
+    keys = list(columns)
+    for name, row in zip(names, zip(*(columns[k] for k in keys))):
+        j = index.get(name)
+        if j is None:
+            index[name] = len(merged_names)
+            merged_names.append(name)
+            for k, v in zip(keys, row):
+                merged[k].append(v)
+        else:
+            for k, v in zip(keys, row):
+                if v != "":
+                    merged[k][j] = v
+    return merged_names, merged
+
+
+def _append_node(names: list, columns: dict, name: str, attrs: dict):
+    """Append one node to the parallel ``names``/``columns`` arrays."""
+    size = len(names)
+    names.append(name)
+    for k, col in columns.items():
+        col.append(attrs.get(k, ""))
+    for k, v in attrs.items():
+        if k not in columns:
+            columns[k] = [""] * size + [v]
+
+
+def _update_node(names: list, columns: dict, j: int, attrs: dict):
+    """Set ``attrs`` on the node at index ``j`` of the parallel arrays."""
+    for k, v in attrs.items():
+        if k not in columns:
+            columns[k] = [""] * len(names)
+        columns[k][j] = v
+
+
+def _power_states(types: list, properties: list) -> list:
+    """Return each VM's nested powerState (e.g. "VM running"), "" for other nodes."""
+    power_states = [''] * len(types)
+    for i, (node_type, properties_str) in enumerate(zip(types, properties)):
+        if node_type.lower() != 'microsoft.compute/virtualmachines':
+            continue
         try:
-            properties = json.loads(properties_str)
-            # Check for exposed NSGs
-            if node_type == 'microsoft.network/networksecuritygroups':
-                rules = properties.get('securityRules', [])
-                for rule in rules:
-                    rule_props = rule.get('properties', {})
-                    if (rule_props.get('direction', '').lower() == 'inbound' and
-                        rule_props.get('access', '').lower() == 'allow' and
-                        rule_props.get('sourceAddressPrefix', '').lower() in internet_sources):
-                        is_exposed = True
-                        break # Found one open rule, no need to check others
-            
-            # Check for exposed Storage Accounts
-            elif node_type == 'microsoft.storage/storageaccounts':
-                network_acls = properties.get('networkAcls', {})
-                if network_acls.get('defaultAction', '').lower() == 'allow':
-                    is_exposed = True
-
-        except (json.JSONDecodeError, AttributeError):
+            power_state = _json.loads(properties_str).get('extended', {}).get('instanceView', {}).get('powerState', {}).get('displayStatus')
+        except (ValueError, AttributeError):
             continue
+        if power_state:
+            power_states[i] = power_state
+    return power_states
 
-        if is_exposed:
-            if not has_internet_node:
-                G.add_node(internet_node_name, type='Internet', group='Internet', size=40)
-                has_internet_node = True
-            G.add_edge(internet_node_name, node_name)
 
-    return G
+# above this many ids, prefer hyperscan over a Python regex when it is installed
+HYPERSCAN_MIN_IDS = 10_000
+
+
+def _build_id_matcher(candidate_ids):
+    """Return a function mapping a haystack string to the set of candidate ids it
+    contains. Uses a single Aho-Corasick automaton when pyahocorasick is
+    installed, hyperscan for very large id sets, and otherwise one compiled
+    regex over all ids.
+    """
+    if not candidate_ids:
+        return lambda hay: ()
+
+    if _HAS_AHOCORASICK:
+        automaton = ahocorasick.Automaton()
+        for idx, cid in enumerate(candidate_ids):
+            automaton.add_word(cid, (idx, cid))
+        automaton.make_automaton()
+        return lambda hay: dict.fromkeys(cid for _, (_, cid) in automaton.iter(hay))
+
+    if _HAS_HYPERSCAN and len(candidate_ids) > HYPERSCAN_MIN_IDS:
+        db = hyperscan.Database()
+        db.compile(expressions=[cid.encode('utf-8') for cid in candidate_ids],
+                   ids=list(range(len(candidate_ids))), elements=len(candidate_ids),
+                   literal=True)
+
+        def find_ids(hay):
+            found = {}
+
+            def on_match(idx, start, end, flags, context):
+                found[candidate_ids[idx]] = None
+
+            db.scan(hay.encode('utf-8'), match_event_handler=on_match)
+            return found
+
+        return find_ids
+
+    # A lookahead lets the regex report a match at every position, but only the
+    # longest id starting there; ids that are a prefix of it (a parent
+    # resource's id, say) are added back from a precomputed table.
+    pattern = re.compile('(?=(' + _trie_regex(candidate_ids) + '))')
+    prefixes = _prefix_ids(candidate_ids)
+    return lambda hay: dict.fromkeys(cid for m in pattern.finditer(hay) for cid in prefixes[m.group(1)])
+
+
+# rows of search text sent to a reference-scan worker at a time
+SCAN_SLICE_ROWS = 500
+
+# matcher used inside reference-scan worker processes, set by _init_scan_worker
+_worker_find_ids = None
+
+
+def _init_scan_worker(candidate_ids):
+    global _worker_find_ids
+    _worker_find_ids = _build_id_matcher(candidate_ids)
+
+
+def _scan_hays(hays: list) -> list:
+    return [list(_worker_find_ids(hay)) for hay in hays]
+
+
+def _scan_hays_parallel(executor: ProcessPoolExecutor, rows, jobs: int):
+    """Match the ``(i, hay)`` pairs from ``rows`` in the executor's workers and
+    yield ``(i, ids)`` in order. Rows are pulled lazily and sent in slices of
+    SCAN_SLICE_ROWS, with only a couple of slices per worker queued at a time,
+    so just a window of the search text is ever held in memory.
+    """
+    rows = iter(rows)
+    pending = collections.deque()
+    while True:
+        while len(pending) < jobs * 2:
+            batch = list(itertools.islice(rows, SCAN_SLICE_ROWS))
+            if not batch:
+                break
+            pending.append(([i for i, _ in batch], executor.submit(_scan_hays, [hay for _, hay in batch])))
+        if not pending:
+            return
+        indices, future = pending.popleft()
+        yield from zip(indices, future.result())
+
+
+def _trie_regex(words) -> str:
+    """Build a regex matching any of ``words``, shaped as a trie so each position
+    is tested against shared prefixes once instead of against every word.
+    Alternatives are greedy, so the longest word matching at a position wins.
+    """
+    trie = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[''] = {}
+
+    def render(node):
+        branches = []
+        for ch, child in sorted(node.items()):
+            if ch == '':
+                continue
+            # collapse runs of single-child nodes into one literal
+            run = [ch]
+            while len(child) == 1 and '' not in child:
+                (ch, child), = child.items()
+                run.append(ch)
+            branches.append(re.escape(''.join(run)) + render(child))
+        if not branches:
+            return ''
+        body = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        return '(?:' + body + ')?' if '' in node else body
+
+    return render(trie)
+
+
+def _prefix_ids(words) -> dict:
+    """Map each word to the list of words that are a prefix of it (itself included)."""
+    prefixes = {}
+    stack = []
+    for word in sorted(words):
+        while stack and not word.startswith(stack[-1]):
+            stack.pop()
+        stack.append(word)
+        prefixes[word] = list(stack)
+    return prefixes
+
+
+def _energy_layout(G: nx.Graph, seed=None, iterations: int = 50) -> dict:
+    """Fruchterman-Reingold layout found by minimising the FR energy with SciPy's
+    L-BFGS-B instead of simulating forces step by step. Converges in far fewer
+    iterations than nx.spring_layout on large graphs. Raises ImportError when
+    SciPy is not installed.
+    """
+    from scipy import optimize, sparse
+
+    nodes = list(G)
+    n = len(nodes)
+    A = nx.to_scipy_sparse_array(G, nodelist=nodes, weight=None, format='csr')
+    A = ((A + A.T) / 2).tocoo()
+    rows, cols, w = A.row, A.col, A.data
+    n_components, labels = sparse.csgraph.connected_components(A, directed=False)
+    component_sizes = np.bincount(labels)
+    k = np.sqrt(1.0 / n)
+    batch = 500
+
+    def energy(x):
+        pos = x.reshape((n, 2))
+        grad = np.zeros((n, 2))
+        # attraction along edges
+        delta = pos[rows] - pos[cols]
+        dist = np.sqrt(np.maximum(np.sum(delta * delta, axis=1), 1e-10))
+        cost = np.sum(w * dist ** 3) / (3 * k)
+        np.add.at(grad, rows, 2 * (w * dist / k)[:, np.newaxis] * delta)
+        # repulsion between every pair of nodes, in batches to bound memory
+        sq = np.sum(pos * pos, axis=1)
+        for lo in range(0, n, batch):
+            hi = min(lo + batch, n)
+            dist2 = np.maximum(sq[lo:hi, np.newaxis] + sq[np.newaxis, :] - 2 * pos[lo:hi] @ pos.T, 1e-10)
+            inv = 1 / dist2
+            grad[lo:hi] -= 2 * k ** 2 * (pos[lo:hi] * inv.sum(axis=1)[:, np.newaxis] - inv @ pos)
+            cost -= k ** 2 * np.sum(np.log(dist2)) / 2
+        # pull each connected component's centroid towards the centre
+        centers = np.zeros((n_components, 2))
+        np.add.at(centers, labels, pos)
+        offset = centers / component_sizes[:, np.newaxis] - 0.5
+        grad += offset[labels]
+        cost += 0.5 * np.sum(component_sizes * np.sum(offset * offset, axis=1))
+        return cost, grad.ravel()
+
+    x0 = np.random.default_rng(seed).random(n * 2)
+    result = optimize.minimize(energy, x0, jac=True, method='L-BFGS-B',
+                               options={'maxiter': iterations, 'gtol': 1e-4})
+    pos = nx.rescale_layout(result.x.reshape((n, 2)))
+    return dict(zip(nodes, pos))
 
 
 def plot_graph(G: nx.Graph, out_path: Path):
-    plt.figure(figsize=(12, 9))
-    # layout
+    """Render a static PNG with matplotlib. Only used with --png, so matplotlib
+    is imported here rather than at startup.
+    """
     try:
-        pos = nx.spring_layout(G, seed=42)
-    except Exception:
-        pos = nx.random_layout(G)
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("matplotlib not installed. Install with: pip install matplotlib")
+        return
+
+    plt.figure(figsize=(12, 9))
+    # layout: large graphs use the energy-based layout when SciPy is available
+    pos = None
+    if G.number_of_nodes() > 500:
+        try:
+            pos = _energy_layout(G, seed=42)
+        except ImportError:
+            pass
+    if pos is None:
+        try:
+            pos = nx.spring_layout(G, seed=42)
+        except Exception:
+            pos = nx.random_layout(G)
 
     # draw nodes and edges
     nx.draw_networkx_edges(G, pos, alpha=0.3)
@@ -156,193 +602,184 @@ def plot_graph(G: nx.Graph, out_path: Path):
         # running headless - ignore
         pass
 
+# SVG icon for network resources
+_NET_SVG = '''<svg xmlns="http://www.w3.org/2000/svg" width="64" height="64" viewBox="0 0 64 64"><circle cx="32" cy="16" r="6" fill="#ff7f00"/><circle cx="16" cy="48" r="6" fill="#6a3d9a"/><circle cx="48" cy="48" r="6" fill="#b15928"/><path d="M32 22 L32 42" stroke="#555" stroke-width="2" stroke-linecap="round"/><path d="M32 42 L18 48" stroke="#555" stroke-width="2" stroke-linecap="round"/><path d="M32 42 L46 48" stroke="#555" stroke-width="2" stroke-linecap="round"/></svg>'''
+
+
+def _image_style(image: str, size: int = 30) -> dict:
+    return {'size': size, 'shapeProperties': {'useImageSize': False}, 'shape': 'image', 'image': image}
+
+
+# (type keyword, style) pairs checked in order against the lowercased type.
+# Extensions come first as their type string also contains 'virtualmachine'.
+_NODE_STYLE_RULES = (
+    ('extensions', _image_style('https://cdn-icons-png.flaticon.com/512/11821/11821370.png')),
+    ('internet', _image_style('https://cdn-icons-png.flaticon.com/512/1011/1011373.png', size=40)),
+    ('virtualmachine', _image_style('https://cdn-icons-png.flaticon.com/512/8036/8036436.png')),
+    ('disks', _image_style('https://cdn-icons-png.flaticon.com/512/2493/2493389.png')),
+    ('storageaccounts', _image_style('https://cdn-icons-png.flaticon.com/512/1975/1975643.png')),
+    ('networkinterface', _image_style('https://cdn-icons-png.flaticon.com/512/969/969430.png')),
+    ('publicipaddress', _image_style('https://cdn-icons-png.flaticon.com/512/6726/6726855.png')),
+    ('networksecuritygroup', _image_style('https://cdn-icons-png.flaticon.com/512/9378/9378191.png')),
+    ('routetable', _image_style('https://cdn-icons-png.flaticon.com/512/2923/2923498.png')),
+    ('virtualnetworks', _image_style('data:image/svg+xml;utf8,' + quote(_NET_SVG))),
+)
+_DEFAULT_NODE_STYLE = {'shape': 'image', 'image': 'https://cdn-icons-png.flaticon.com/512/15549/15549062.png', 'size': 25}
+
+
+@functools.lru_cache(maxsize=None)
 def _get_node_style(node_type: str) -> dict:
-    """Return pyvis style options for a given Azure resource type."""
-    tlow = (node_type or '').lower()
+    """Return vis.js node style options for a given Azure resource type.
 
-    # SVG icon for network resources
-    net_svg = '''<svg xmlns="http://www.w3.org/2000/svg" width="64" height="64" viewBox="0 0 64 64"><circle cx="32" cy="16" r="6" fill="#ff7f00"/><circle cx="16" cy="48" r="6" fill="#6a3d9a"/><circle cx="48" cy="48" r="6" fill="#b15928"/><path d="M32 22 L32 42" stroke="#555" stroke-width="2" stroke-linecap="round"/><path d="M32 42 L18 48" stroke="#555" stroke-width="2" stroke-linecap="round"/><path d="M32 42 L46 48" stroke="#555" stroke-width="2" stroke-linecap="round"/></svg>'''
-    net_data_url = 'data:image/svg+xml;utf8,' + quote(net_svg)
-
-    # External PNG icons
-    ip_data_url = 'https://cdn-icons-png.flaticon.com/512/6726/6726855.png'
-    nic_data_url = 'https://cdn-icons-png.flaticon.com/512/969/969430.png'
-    nsg_data_url = 'https://cdn-icons-png.flaticon.com/512/9378/9378191.png'
-    disk_data_url = 'https://cdn-icons-png.flaticon.com/512/2493/2493389.png'
-    routetable_data_url = 'https://cdn-icons-png.flaticon.com/512/2923/2923498.png'
-    internet_data_url = 'https://cdn-icons-png.flaticon.com/512/1011/1011373.png'
-    storage_data_url = 'https://cdn-icons-png.flaticon.com/512/1975/1975643.png'
-    default_data_url = 'https://cdn-icons-png.flaticon.com/512/15549/15549062.png'
-
-    # Define styles based on type keywords
-    vm_data_url = 'https://cdn-icons-png.flaticon.com/512/8036/8036436.png'
-    extension_data_url = 'https://cdn-icons-png.flaticon.com/512/11821/11821370.png'
-    style = {'size': 30, 'shapeProperties': {'useImageSize': False}}
-    # Check for extensions first as its type string also contains 'virtualmachine'
-    if 'extensions' in tlow:
-        style.update({'shape': 'image', 'image': extension_data_url})
-        return style
-    if 'internet' in tlow:
-        style.update({'shape': 'image', 'image': internet_data_url, 'size': 40})
-        return style
-    if 'virtualmachine' in tlow:
-        style.update({'shape': 'image', 'image': vm_data_url})
-        return style
-    if 'disks' in tlow:
-        style.update({'shape': 'image', 'image': disk_data_url})
-        return style
-    if 'storageaccounts' in tlow:
-        style.update({'shape': 'image', 'image': storage_data_url})
-        return style
-    if 'networkinterface' in tlow:
-        style.update({'shape': 'image', 'image': nic_data_url})
-        return style
-    if 'publicipaddress' in tlow:
-        style.update({'shape': 'image', 'image': ip_data_url})
-        return style
-    if 'networksecuritygroup' in tlow:
-        style.update({'shape': 'image', 'image': nsg_data_url})
-        return style
-    if 'routetable' in tlow:
-        style.update({'shape': 'image', 'image': routetable_data_url})
-        return style
-    if 'virtualnetworks' in tlow:
-        style.update({'shape': 'image', 'image': net_data_url})
-        return style
-
-    # Default style
-    return {'shape': 'image', 'image': default_data_url, 'size': 25}
+    Results are cached and shared between calls, so callers must not mutate them.
+    """
+    tlow = (node_type or '').lower()
+    for keyword, style in _NODE_STYLE_RULES:
+        if keyword in tlow:
+            return style
+    return _DEFAULT_NODE_STYLE
 
 def export_interactive(G: nx.Graph, out_path: Path):
-    """Export an interactive HTML using pyvis. If pyvis is not installed, print
-    an instruction and skip export.
+    """Export an interactive vis.js HTML page for the graph."""
+    nodes = list(G.nodes(data=True))
+    keys = list(dict.fromkeys(k for _, data in nodes for k in data))
+    columns = {k: [data.get(k, "") for _, data in nodes] for k in keys}
+    export_interactive_arrays([name for name, _ in nodes], columns, list(G.edges()), out_path)
+
+
+# vis.js network options; keeps the physics from leaving huge gaps between nodes
+VIS_OPTIONS = {
+    "physics": {
+        "enabled": True,
+        "solver": "barnesHut",
+        "barnesHut": {"gravitationalConstant": -10000, "centralGravity": 0.3, "springLength": 120, "springConstant": 0.05, "damping": 0.09},
+        "minVelocity": 0.75
+    },
+    "edges": {"smooth": {"enabled": True, "type": "dynamic"}}
+}
+
+
+def export_interactive_arrays(names: list, columns: dict, edges: list, out_path: Path):
+    """Same as export_interactive, but takes the parallel arrays returned by
+    build_edges_and_attrs so no DiGraph has to be built.
+
+    The node and edge lists are serialized straight into a static vis.js page
+    (lib/bindings/network.html), then the control panel template is added.
     """
-    if not _HAS_PYVIS:
-        print("pyvis not installed. Install with: pip install pyvis")
-        return
-
-    net = Network(height='800px', width='100%', directed=True)
-    net.force_atlas_2based()
-
-    # Default vis.js options to avoid huge gaps between nodes
-    net.set_options("""
-    var options = {
-        "physics": {
-            "enabled": true,
-            "solver": "barnesHut",
-            "barnesHut": {"gravitationalConstant": -10000, "centralGravity": 0.3, "springLength": 120, "springConstant": 0.05, "damping": 0.09},
-            "minVelocity": 0.75
-        },
-        "edges": {"smooth": {"enabled": true, "type": "dynamic"}}
-    }
-    """)
-
-    # collect node types for coloring
-    type_to_color = {}
-    palette = ["#1f78b4", "#33a02c", "#e31a1c", "#ff7f00", "#6a3d9a", "#b15928"]
-
-    for i, n in enumerate(G.nodes(data=True)):
-        name, data = n
-        ntype = data.get('type', 'unknown') if isinstance(data, dict) else 'unknown'
-        if ntype not in type_to_color:
-            type_to_color[ntype] = palette[len(type_to_color) % len(palette)]
-
-    for name, data in G.nodes(data=True):
+    n = len(names)
+    types = [t or 'unknown' for t in columns.get('type', [''] * n)]
+    type_to_style = {ntype: _get_node_style(ntype) for ntype in dict.fromkeys(types)}
+
+    # build node attributes from CSV-derived data so the client can access original
+    # fields; column values are already strings, "" meaning the node has none
+    keys = list(columns)
+    attrs_list = [{k: v for k, v in zip(keys, row) if v != ""} for row in zip(*(columns[k] for k in keys))]
+    if not keys:
+        attrs_list = [{} for _ in range(n)]
+
+    nodes = []
+    for name, ntype, node_attrs in zip(names, types, attrs_list):
         title_lines = [f"<b>{name}</b>"]
-        rg = None
-        if isinstance(data, dict):
-            for k in ('type', 'resourceGroup', 'location', 'id'):
-                if data.get(k):
-                    title_lines.append(f"{k}: {data.get(k)}")
-            rg = data.get('resourceGroup')
+        for k in ('type', 'resourceGroup', 'location', 'id'):
+            if node_attrs.get(k):
+                title_lines.append(f"{k}: {node_attrs[k]}")
         title = '<br>'.join(title_lines)
-        ntype = data.get('type', 'unknown') if isinstance(data, dict) else 'unknown'
-        color = type_to_color.get(ntype, '#888')
-        # build node attributes from CSV-derived data so the client can access original fields
-        node_attrs = {}
-        if isinstance(data, dict):
-            for k, v in data.items():
-                try:
-                    node_attrs[k] = str(v)
-                except Exception:
-                    node_attrs[k] = v
-        # ensure UI-related fields are set/overridden
+        rg = node_attrs.get('resourceGroup')
 
-        # --- Extract nested VM powerState and add as a top-level attribute ---
-        if ntype.lower() == 'microsoft.compute/virtualmachines':
-            try:
-                props = json.loads(data.get('properties', '{}'))
-                power_state = props.get('extended', {}).get('instanceView', {}).get('powerState', {}).get('displayStatus')
-                if power_state:
-                    node_attrs['powerState'] = power_state
-            except (json.JSONDecodeError, AttributeError):
-                pass # Ignore if properties are malformed
-        # ---
-
-        # avoid passing 'title' to pyvis nodes (it becomes a hover tooltip); use
+        # ensure UI-related fields are set/overridden.
+        # avoid 'title' on nodes (vis.js shows it as a hover tooltip); use
         # a separate 'details' attribute that our properties panel will read.
         node_attrs.update({
             'label': name,
             'details': title,
-            'color': color,
             'group': ntype,
             'resourceGroup': rg,
         })
-        node_attrs.update(_get_node_style(ntype))
-        net.add_node(name, **node_attrs)
+        node_attrs.update(type_to_style[ntype])
+        node_attrs['id'] = name
+        nodes.append(node_attrs)
+
+    edge_list = [{'from': src, 'to': dst, 'arrows': 'to'} for src, dst in edges]
 
-    for src, dst in G.edges():
-        net.add_edge(src, dst)
+    # fill the placeholders in one pass so data can never be mistaken for one
+    values = {b'nodes': _to_script_json(nodes), b'edges': _to_script_json(edge_list),
+              b'options': _to_script_json(VIS_OPTIONS)}
+    html = re.sub(rb'\{\{(nodes|edges|options)\}\}', lambda m: values[m.group(1)], _load_page())
 
-    out_path = str(out_path)
-    # write_html is more reliable in non-notebook environments
-    net.write_html(out_path)
+    # Inject a small control panel (filters, physics toggle, save/load positions)
+    # before </body>; its script hooks into the global vis Network instance.
+    try:
+        html = html.replace(b'</body>', _load_template() + b'\n</body>', 1)
+    except Exception as e:
+        print(f'Warning: could not read control panel template: {e}')
+
+    Path(out_path).write_bytes(html)
     print(f"Saved interactive graph to: {out_path}")
 
-    # Post-process the generated HTML to inject a small control panel (filters, physics toggle,
-    # save/load positions). We append a script before </body> that hooks into the vis Network instance.
-    _inject_interactive_controls(out_path)
 
+def _to_script_json(obj) -> bytes:
+    """Serialize ``obj`` for inlining in a <script> block. "</" is escaped so no
+    value from the CSV can close the script tag.
+    """
+    data = _json.dumps(obj)
+    if isinstance(data, str):
+        data = data.encode('utf-8')
+    return data.replace(b'</', b'<\\/')
 
-def _inject_interactive_controls(out_path: str):
-    """Injects JS and HTML for filters and other controls into the pyvis output file."""
-    try:
-        html = Path(out_path).read_text(encoding='utf-8')
-        template_path = Path(__file__).resolve().parents[1] / 'lib' / 'bindings' / 'template.html'
-        inject_html = template_path.read_text(encoding='utf-8')
-    except Exception as e:
-        print(f'Warning: could not read generated HTML or template: {e}')
-        return
 
-    if '</body>' in html:
-        html = html.replace('</body>', inject_html + '\n</body>')
-        Path(out_path).write_text(html, encoding='utf-8')
+@functools.lru_cache(maxsize=1)
+def _load_page() -> bytes:
+    """Read the vis.js page skeleton once per process."""
+    return (Path(__file__).resolve().parents[1] / 'lib' / 'bindings' / 'network.html').read_bytes()
+
+
+@functools.lru_cache(maxsize=1)
+def _load_template() -> bytes:
+    """Read the control-panel template once per process."""
+    return (Path(__file__).resolve().parents[1] / 'lib' / 'bindings' / 'template.html').read_bytes()
 
 
 def main(argv):
     """Main execution function."""
-    # Set default path relative to the script's location
-    azure_data_dir = Path(__file__).resolve().parents[1] / 'Test_data' / 'Azure'
-    
-    # Find the first CSV file in the directory
-    try:
-        default = next(azure_data_dir.glob('*.csv'))
-    except StopIteration:
-        print(f"No CSV files found in {azure_data_dir}.")
-        raise SystemExit(1)
+    parser = argparse.ArgumentParser(description="Visualize an Azure Resource Graph CSV export.")
+    parser.add_argument('csv_path', nargs='?', type=Path,
+                        help="CSV export to read (default: first CSV in Test_data/Azure)")
+    parser.add_argument('--png', action='store_true',
+                        help="also render a static azure_graph.png with matplotlib (slow on large graphs)")
+    parser.add_argument('--chunksize', type=int, default=None, metavar='ROWS',
+                        help="stream the CSV in chunks of this many rows instead of loading it whole")
+    parser.add_argument('--jobs', type=int, default=1, metavar='N',
+                        help="scan for references in N worker processes (0 = one per CPU)")
+    args = parser.parse_args(argv[1:])
+
+    csv_path = args.csv_path
+    if csv_path is None:
+        # Set default path relative to the script's location
+        azure_data_dir = Path(__file__).resolve().parents[1] / 'Test_data' / 'Azure'
+
+        # Find the first CSV file in the directory
+        try:
+            csv_path = next(azure_data_dir.glob('*.csv'))
+        except StopIteration:
+            print(f"No CSV files found in {azure_data_dir}.")
+            raise SystemExit(1)
 
-    csv_path = Path(argv[1]) if len(argv) > 1 else default
     if not csv_path.exists():
         print(f"CSV not found at {csv_path}. Provide path as first argument.")
         raise SystemExit(1)
 
     print(f"Loading CSV from: {csv_path}")
-    G = build_graph_from_csv(csv_path)
-    print(f"Built graph: {G.number_of_nodes()} nodes, {G.number_of_edges()} edges")
+    names, columns, edges = build_edges_and_attrs(csv_path, args.chunksize, args.jobs)
+    print(f"Built graph: {len(names)} nodes, {len(edges)} edges")
 
-    # Generate the interactive HTML output
+    # Generate the interactive HTML output. vis.js lays the graph out in the
+    # browser, so no positions are computed here.
     html_out = Path.cwd() / 'azure_graph.html'
-    export_interactive(G, html_out)
+    export_interactive_arrays(names, columns, edges, html_out)
+
+    # The static image needs a full layout pass in Python, so it is opt-in
+    if args.png:
+        plot_graph(graph_from_arrays(names, columns, edges), Path.cwd() / 'azure_graph.png')
 
 
 if __name__ == '__main__':